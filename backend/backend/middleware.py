@@ -0,0 +1,166 @@
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# text/html не сжимается: страницы админки и browsable API содержат
+# CSRF-токен, и сжатие открыло бы их для атаки BREACH.
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv')
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения сервера."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def compressor(encoding):
+    """Возвращает пару функций: сжать очередной кусок и завершить поток."""
+    if encoding == 'zstd':
+        compressobj = zstandard.ZstdCompressor(level=3).compressobj()
+        return compressobj.compress, compressobj.flush
+    if encoding == 'br':
+        compressobj = brotli.Compressor(quality=5)
+        return compressobj.process, compressobj.finish
+    # wbits=31 — формат gzip с заголовком и контрольной суммой.
+    compressobj = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressobj.compress, compressobj.flush
+
+
+def compress(encoding, content):
+    feed, finish = compressor(encoding)
+    return feed(content) + finish()
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """Сжатие ответов gzip, brotli или zstd по заголовку Accept-Encoding.
+
+    Сжимаются только ответы API (COMPRESSION_PATHS) не меньше
+    COMPRESSION_MIN_SIZE. Сжатые варианты обычных ответов кешируются в
+    отдельном кеше compression по хешу содержимого, поэтому одинаковые
+    горячие ответы сжимаются один раз. Потоковые ответы сжимаются по
+    мере отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def negotiate(self, request):
+        accepted = parse_accept_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for encoding in available_encodings():
+            if accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if (
+            response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+            or not request.path.startswith(tuple(settings.COMPRESSION_PATHS))
+            or request.path.startswith(
+                tuple(settings.COMPRESSION_EXCLUDE_PATHS)
+            )
+        ):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                stream = self.compress_async_stream
+            else:
+                stream = self.compress_stream
+            response.streaming_content = stream(
+                encoding, response.streaming_content
+            )
+            del response.headers['Content-Length']
+        else:
+            compressed = self.compress_cached(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_cached(self, encoding, content):
+        if len(content) > settings.COMPRESSION_CACHE_MAX_SIZE:
+            return compress(encoding, content)
+        cache = caches['compression']
+        key = f'{encoding}:{hashlib.sha256(content).hexdigest()}'
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(encoding, content)
+            cache.set(
+                key, compressed, timeout=settings.COMPRESSION_CACHE_TTL
+            )
+        return compressed
+
+    def compress_stream(self, encoding, chunks):
+        feed, finish = compressor(encoding)
+        for chunk in chunks:
+            data = feed(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    async def compress_async_stream(self, encoding, chunks):
+        feed, finish = compressor(encoding)
+        async for chunk in chunks:
+            data = feed(chunk)
+            if data:
+                yield data
+        yield finish()
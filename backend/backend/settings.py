@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,11 +23,13 @@ INSTALLED_APPS = [
     'recipes',
     'ingredients',
     'users',
+    'profiling',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'backend.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -34,6 +37,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -69,6 +73,31 @@ DATABASES = {
     }
 }
 
+# Кеш токенов должен быть общим для всех воркеров, иначе сброс токена
+# видит только процесс, который его выполнил. Без Redis используется
+# таблица в базе (python manage.py createcachetable).
+REDIS_URL = os.getenv('REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'auth_tokens': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'auth_tokens',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'auth_token_cache',
+    },
+    # Сжатые ответы API; свой лимит, чтобы не вытеснять другие кеши.
+    'compression': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compression',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -99,7 +128,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -124,4 +153,37 @@ DJOSER = {
     },
 }
 
-AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'users.User'
+
+# Поиск рецептов по имеющимся ингредиентам
+PANTRY_REFRESH_INTERVAL = 10
+PANTRY_REBUILD_INTERVAL = 24 * 3600
+PANTRY_READY_TIMEOUT = 5
+PANTRY_OVERLAY_LIMIT = 5000
+PANTRY_SEARCH_LIMIT = 600
+
+# Кеширование токенов аутентификации
+AUTH_TOKEN_CACHE_TTL = 300
+AUTH_TOKEN_LOCAL_TTL = 10
+AUTH_TOKEN_LOCAL_SIZE = 10000
+
+# Сжатие ответов
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CACHE_TTL = 600
+COMPRESSION_CACHE_MAX_SIZE = 256 * 1024
+COMPRESSION_PATHS = ['/api/']
+# Ответы с токенами не сжимаем (атака BREACH).
+COMPRESSION_EXCLUDE_PATHS = ['/api/auth/']
+
+# Популярные рецепты (?ordering=trending)
+TRENDING_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_WEIGHTS = {'favorite': 1.0, 'shopping_cart': 0.5}
+TRENDING_LIMIT = 600
+TRENDING_CACHE_TTL = 300
+
+# Профилирование запросов (заголовок X-Profile, команда profiles)
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 100
+PROFILING_SAMPLE_RATE = 0
+PROFILING_INTERVAL = 0.005
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Индекс поиска по продуктам строится в фоне при старте воркера,
+# а не на первом запросе к /api/recipes/cookable/.
+from recipes.pantry import pantry_index  # noqa: E402
+
+pantry_index.start()
@@ -0,0 +1,91 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from profiling.storage import list_profiles, load_profile
+
+
+def short_name(file, line, func):
+    return f'{file}:{line}({func})'
+
+
+class Command(BaseCommand):
+    help = (
+        'Список сохранённых профилей запросов или вывод одного профиля. '
+        'С --collapsed печатает стеки профиля в режиме выборки в формате '
+        'flamegraph.pl / speedscope; cProfile хранит только пары «вызывающая '
+        '— вызываемая функция», полных стеков в нём нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?')
+        parser.add_argument('--collapsed', action='store_true')
+        parser.add_argument('--limit', type=int, default=25)
+
+    def handle(self, *args, **options):
+        if options['profile_id'] is None:
+            return self.list_profiles()
+        try:
+            profile = load_profile(options['profile_id'])
+        except FileNotFoundError:
+            raise CommandError(f"Профиль {options['profile_id']} не найден")
+        if options['collapsed']:
+            if profile['mode'] != 'sample':
+                raise CommandError(
+                    '--collapsed выводит только стеки профиля в режиме '
+                    'выборки; в профиле cProfile нет полных стеков'
+                )
+            for stack, count in profile['samples'].items():
+                self.stdout.write(f'{stack} {count}')
+            return
+        self.show(profile, options['limit'])
+
+    def list_profiles(self):
+        for profile_id in list_profiles():
+            profile = load_profile(profile_id)
+            sql_time = sum(query['duration'] for query in profile['sql'])
+            self.stdout.write(
+                f"{profile_id}  {profile['method']} {profile['path']} "
+                f"-> {profile['status']}  "
+                f"{profile['duration'] * 1000:.1f} мс  {profile['mode']}  "
+                f"SQL: {len(profile['sql'])} за {sql_time * 1000:.1f} мс"
+            )
+
+    def show(self, profile, limit):
+        self.stdout.write(
+            f"{profile['method']} {profile['path']} -> {profile['status']}, "
+            f"{profile['duration'] * 1000:.1f} мс, режим {profile['mode']}"
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"SQL-запросы ({len(profile['sql'])}):"
+        ))
+        queries = sorted(
+            profile['sql'], key=lambda query: query['duration'], reverse=True
+        )
+        for query in queries[:limit]:
+            self.stdout.write(
+                f"{query['duration'] * 1000:8.2f} мс  {query['sql']}"
+            )
+
+        if profile['mode'] == 'sample':
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Функции на вершине стека (выборки):'
+            ))
+            leaves = Counter()
+            for stack, count in profile['samples'].items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            for name, count in leaves.most_common(limit):
+                duration = count * profile['interval'] * 1000
+                self.stdout.write(f'{duration:8.1f} мс  {name}')
+        else:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Функции по суммарному времени (cProfile):'
+            ))
+            self.stdout.write('   вызовов   собств. мс   всего мс  функция')
+            stats = sorted(
+                profile['stats'], key=lambda row: row[6], reverse=True
+            )
+            for file, line, func, cc, nc, tt, ct, _ in stats[:limit]:
+                self.stdout.write(
+                    f'{nc:10d} {tt * 1000:12.2f} {ct * 1000:10.2f}  '
+                    f'{short_name(file, line, func)}'
+                )
@@ -0,0 +1,170 @@
+import cProfile
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+from users.authentication import CachedTokenAuthentication
+
+from .storage import save_profile
+
+# cProfile нельзя запускать в нескольких потоках одновременно.
+cprofile_lock = threading.Lock()
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_filename}:{code.co_name}'
+
+
+class StackSampler(threading.Thread):
+    """Статистический профилировщик: раз в интервал снимает стек потока."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, запоминающая SQL и время выполнения."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'db': self.alias,
+                'sql': sql,
+                'many': many,
+                'duration': time.perf_counter() - started,
+            })
+
+
+def cprofile_stats(profiler):
+    stats = pstats.Stats(profiler).stats
+    return [
+        [
+            *func, cc, nc, tt, ct,
+            [[*caller, *timing] for caller, timing in callers.items()],
+        ]
+        for func, (cc, nc, tt, ct, callers) in stats.items()
+    ]
+
+
+class ProfilingMiddleware:
+    """Профилирование одного запроса вместе с выполненными SQL-запросами.
+
+    Запускается для сотрудников по заголовку X-Profile (значение cprofile
+    включает детерминированный cProfile, любое другое — статистический
+    сэмплер) или для доли PROFILING_SAMPLE_RATE всех запросов. Результаты
+    смотрит команда profiles.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        if mode == 'cprofile' and not cprofile_lock.acquire(blocking=False):
+            mode = 'sample'
+        try:
+            return self.profile(request, mode)
+        finally:
+            if mode == 'cprofile':
+                cprofile_lock.release()
+
+    def requested_mode(self, request):
+        header = request.META.get('HTTP_X_PROFILE')
+        if header and self.is_staff(request):
+            return 'cprofile' if header == 'cprofile' else 'sample'
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return 'sample'
+        return None
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return result is not None and result[0].is_staff
+
+    def profile(self, request, mode):
+        recorders = [
+            QueryRecorder(connection.alias)
+            for connection in connections.all()
+        ]
+        sampler = profiler = None
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                sampler = StackSampler(
+                    threading.get_ident(), settings.PROFILING_INTERVAL
+                )
+                sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                else:
+                    sampler.stop()
+        duration = time.perf_counter() - started
+
+        data = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration': duration,
+            'mode': mode,
+            'sql': [
+                query for recorder in recorders for query in recorder.queries
+            ],
+        }
+        if profiler is not None:
+            data['stats'] = cprofile_stats(profiler)
+        else:
+            data['interval'] = settings.PROFILING_INTERVAL
+            data['samples'] = dict(sampler.stacks)
+        profile_id = save_profile(data)
+        if 'HTTP_X_PROFILE' in request.META:
+            response.headers['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,45 @@
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def profile_dir():
+    path = settings.PROFILING_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_profile(data):
+    """Сохраняет профиль и удаляет самые старые сверх PROFILING_MAX_FILES."""
+    started_at = timezone.now()
+    profile_id = f"{started_at:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    data = dict(data, id=profile_id, created_at=started_at.isoformat())
+    path = profile_dir()
+    tmp_path = os.path.join(path, f'.{profile_id}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(path, f'{profile_id}.json'))
+    for old_id in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(path, f'{old_id}.json'))
+        except FileNotFoundError:
+            pass
+    return profile_id
+
+
+def list_profiles():
+    """Идентификаторы сохранённых профилей, от новых к старым."""
+    names = [
+        name[:-5] for name in os.listdir(profile_dir())
+        if name.endswith('.json')
+    ]
+    return sorted(names, reverse=True)
+
+
+def load_profile(profile_id):
+    path = os.path.join(profile_dir(), f'{profile_id}.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
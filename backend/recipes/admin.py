@@ -1,21 +1,86 @@
 from django.contrib import admin
-from .models import Recipe, RecipeIngredient, Tag
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Favorite, Recipe, RecipeIngredient, Tag
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий число строк больших таблиц из статистики PostgreSQL.
+
+    Оценка используется только для нефильтрованного списка; при фильтрах
+    и поиске считается точное значение.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ['ingredient']
+
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'author']
+    list_display = ['name', 'author', 'favorite_count', 'created_at']
+    list_select_related = ['author']
     search_fields = ['name', 'author__username']
+    autocomplete_fields = ['author', 'tags']
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     inlines = [RecipeIngredientInline]
     readonly_fields = ['favorite_count']
+    actions = ['mark_deleted']
+
+    def get_queryset(self, request):
+        # Коррелированный подзапрос считается только для строк
+        # текущей страницы.
+        favorites = (
+            Favorite.objects.filter(recipe=OuterRef('pk'))
+            .values('recipe')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return super().get_queryset(request).annotate(
+            favorite_total=Coalesce(Subquery(favorites), 0)
+        )
 
     def favorite_count(self, obj):
-        return obj.favorite_set.count()
+        return obj.favorite_total
     favorite_count.short_description = 'В избранном'
+    favorite_count.admin_order_field = 'favorite_total'
+
+    def mark_deleted(self, request, queryset):
+        now = timezone.now()
+        queryset.update(deleted_at=now, updated_at=now)
+    mark_deleted.short_description = 'Скрыть и удалить в фоне'
+
+    def has_delete_permission(self, request, obj=None):
+        # Вместо синхронного каскада — mark_deleted и purge_deleted.
+        return False
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug']
\ No newline at end of file
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
+    ordering = ['name']
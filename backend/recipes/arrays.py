@@ -0,0 +1,12 @@
+from array import array
+
+import numpy as np
+
+
+def columns(queryset, width, chunk_size=10000):
+    """Читает values_list в numpy-массивы по столбцам без списка кортежей."""
+    result = [array('q') for _ in range(width)]
+    for row in queryset.iterator(chunk_size=chunk_size):
+        for column, value in zip(result, row):
+            column.append(value)
+    return [np.frombuffer(column, dtype=np.int64) for column in result]
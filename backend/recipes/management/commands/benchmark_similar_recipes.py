@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пересчёт похожих рецептов на синтетическом каталоге без '
+        'обращения к базе. Частоты ингредиентов распределены по закону '
+        'Ципфа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--ingredients', type=int, default=2186)
+        parser.add_argument('--per-recipe', type=int, default=9)
+        parser.add_argument(
+            '--sample', type=int, default=20000,
+            help='Сколько рецептов реально посчитать',
+        )
+        parser.add_argument('--top-k', type=int, default=similarity.TOP_K)
+        parser.add_argument(
+            '--max-df', type=float, default=similarity.MAX_DF
+        )
+        parser.add_argument(
+            '--min-score', type=float, default=similarity.MIN_SCORE
+        )
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        n_recipes = options['recipes']
+        rng = np.random.default_rng(options['seed'])
+        popularity = 1 / np.arange(1, options['ingredients'] + 1)
+        size = n_recipes * options['per_recipe']
+        rows = np.repeat(np.arange(n_recipes), options['per_recipe'])
+        cols = rng.choice(
+            options['ingredients'], size=size, p=popularity / popularity.sum()
+        )
+        weights = np.log1p(rng.integers(1, 500, size=size)).astype(np.float32)
+
+        started = time.perf_counter()
+        matrix = similarity.feature_matrix(
+            rows, cols, weights, (n_recipes, options['ingredients']),
+            options['max_df'], options['ingredients'],
+        )
+        matrix_time = time.perf_counter() - started
+
+        sample = min(options['sample'], n_recipes)
+        targets = rng.choice(n_recipes, size=sample, replace=False)
+        started = time.perf_counter()
+        pairs = 0
+        for _, owners, *_ in similarity.top_k_neighbours(
+            matrix, targets, options['top_k'], options['min_score'],
+            options['batch_size'],
+        ):
+            pairs += len(owners)
+        neighbours_time = time.perf_counter() - started
+        projected = matrix_time + neighbours_time * n_recipes / sample
+
+        self.stdout.write(
+            f'Рецептов: {n_recipes}, ненулевых весов: {matrix.nnz}'
+        )
+        self.stdout.write(f'Построение матрицы: {matrix_time:.1f} с')
+        self.stdout.write(
+            f'Соседи для {sample} рецептов: {neighbours_time:.1f} с, '
+            f'пар: {pairs}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценка полного пересчёта: {projected / 60:.1f} мин'
+        ))
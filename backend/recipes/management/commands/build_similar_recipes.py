@@ -0,0 +1,140 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes import similarity
+from recipes.arrays import columns
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по ингредиентам и тегам. По умолчанию '
+        'обновляет рецепты, изменённые после прошлого запуска, и рецепты, '
+        'в чьих соседях они могут появиться или смениться.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать соседей всех рецептов',
+        )
+        parser.add_argument('--top-k', type=int, default=similarity.TOP_K)
+        parser.add_argument(
+            '--tag-weight', type=float, default=similarity.TAG_WEIGHT
+        )
+        parser.add_argument(
+            '--max-df', type=float, default=similarity.MAX_DF,
+            help='Максимальная доля рецептов с ингредиентом',
+        )
+        parser.add_argument(
+            '--min-score', type=float, default=similarity.MIN_SCORE
+        )
+        parser.add_argument('--batch-size', type=int, default=256)
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        last_run = SimilarRecipe.objects.aggregate(
+            last=Max('computed_at')
+        )['last']
+        # Изменённые рецепты выбираются до списка всех рецептов: рецепт,
+        # созданный между запросами, иначе не найдётся в recipe_ids.
+        changed = stale = None
+        if not options['full'] and last_run is not None:
+            changed = columns(
+                Recipe.objects.alive().filter(updated_at__gte=last_run)
+                .values_list('pk'),
+                1,
+            )[0]
+            # Рецепты, в чьих соседях есть изменённый или удалённый рецепт:
+            # его сходство с ними могло упасть ниже порога.
+            stale = columns(
+                SimilarRecipe.objects
+                .filter(similar__updated_at__gte=last_run)
+                .values_list('recipe_id'),
+                1,
+            )[0]
+        recipe_ids = columns(
+            Recipe.objects.alive().order_by('pk').values_list('pk'), 1
+        )[0]
+        matrix = self.build_matrix(
+            recipe_ids, options['tag_weight'], options['max_df']
+        )
+
+        if changed is None:
+            targets = np.arange(len(recipe_ids))
+        else:
+            # Рецепт мог быть удалён, пока строилась выборка.
+            changed = changed[np.isin(changed, recipe_ids)]
+            stale = stale[np.isin(stale, recipe_ids)]
+            # Изменённые рецепты могут войти в соседи любого похожего на
+            # них рецепта, поэтому пересчитываются и все такие рецепты.
+            targets = np.union1d(
+                similarity.related_rows(
+                    matrix, np.searchsorted(recipe_ids, changed),
+                    options['min_score'], options['batch_size'],
+                ),
+                np.searchsorted(recipe_ids, stale),
+            )
+
+        total = 0
+        for batch, owners, neighbours, scores, ranks in (
+            similarity.top_k_neighbours(
+                matrix, targets, options['top_k'], options['min_score'],
+                options['batch_size'],
+            )
+        ):
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(
+                    recipe_id__in=recipe_ids[batch].tolist()
+                ).delete()
+                SimilarRecipe.objects.bulk_create(
+                    SimilarRecipe(
+                        recipe_id=recipe_id, similar_id=similar_id,
+                        score=score, rank=rank, computed_at=started_at,
+                    )
+                    for recipe_id, similar_id, score, rank in zip(
+                        recipe_ids[owners].tolist(),
+                        recipe_ids[neighbours].tolist(),
+                        scores.tolist(),
+                        ranks.tolist(),
+                    )
+                )
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны похожие рецепты для {total} рецептов'
+        ))
+
+    def build_matrix(self, recipe_ids, tag_weight, max_df):
+        recipe_col, ingredient_col, amounts = columns(
+            RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id', 'amount'
+            ),
+            3,
+        )
+        tag_recipe_col, tag_col = columns(
+            Recipe.tags.through.objects.values_list('recipe_id', 'tag_id'), 2
+        )
+        ingredient_ids, ingredient_features = np.unique(
+            ingredient_col, return_inverse=True
+        )
+        tag_ids, tag_features = np.unique(tag_col, return_inverse=True)
+
+        recipe_col = np.concatenate([recipe_col, tag_recipe_col])
+        features = np.concatenate(
+            [ingredient_features, tag_features + len(ingredient_ids)]
+        )
+        weights = np.concatenate([
+            np.log1p(amounts).astype(np.float32),
+            np.full(len(tag_col), tag_weight, dtype=np.float32),
+        ])
+        # Оставляем только строки живых рецептов.
+        rows = np.searchsorted(recipe_ids, recipe_col)
+        alive = rows < len(recipe_ids)
+        alive[alive] = recipe_ids[rows[alive]] == recipe_col[alive]
+        return similarity.feature_matrix(
+            rows[alive], features[alive], weights[alive],
+            (len(recipe_ids), len(ingredient_ids) + len(tag_ids)), max_df,
+            len(ingredient_ids),
+        )
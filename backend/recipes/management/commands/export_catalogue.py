@@ -0,0 +1,135 @@
+import json
+import sys
+import tarfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка пользователей (без паролей), тегов, ингредиентов, '
+        'рецептов и избранного в формате JSON Lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', help='Файл для выгрузки, "-" — стандартный вывод'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--images',
+            help='Tar-архив, в который будут сохранены изображения рецептов',
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        if options['output'] == '-':
+            output = sys.stdout
+        else:
+            output = open(options['output'], 'w', encoding='utf-8')
+        images = None
+        if options['images']:
+            images = tarfile.open(options['images'], 'w|')
+        counts = {}
+        try:
+            for model, records in (
+                ('user', self.users()),
+                ('tag', self.tags()),
+                ('ingredient', self.ingredients()),
+                ('recipe', self.recipes(images)),
+                ('favorite', self.favorites()),
+            ):
+                counts[model] = 0
+                for record in records:
+                    output.write(json.dumps(
+                        dict(record, model=model), ensure_ascii=False
+                    ))
+                    output.write('\n')
+                    counts[model] += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+            if images is not None:
+                images.close()
+        summary = ', '.join(
+            f'{model}: {count}' for model, count in counts.items()
+        )
+        self.stderr.write(
+            self.style.SUCCESS(f'Выгрузка завершена ({summary})')
+        )
+
+    def users(self):
+        return (
+            User.objects.filter(deleted_at__isnull=True).order_by('pk')
+            .values('email', 'username', 'first_name', 'last_name')
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def tags(self):
+        return (
+            Tag.objects.order_by('pk').values('name', 'color', 'slug')
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def ingredients(self):
+        return (
+            Ingredient.objects.order_by('pk')
+            .values('name', 'measurement_unit')
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def recipes(self, images):
+        ingredients = RecipeIngredient.objects.select_related(
+            'ingredient'
+        ).only('recipe_id', 'amount', 'ingredient__name')
+        recipes = (
+            Recipe.objects.alive().order_by('pk').select_related('author')
+            .prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('slug')),
+                Prefetch('recipeingredient_set', queryset=ingredients),
+            )
+        )
+        for recipe in recipes.iterator(chunk_size=self.chunk_size):
+            if images is not None and recipe.image:
+                self.add_image(images, recipe.image)
+            yield {
+                'id': recipe.pk,
+                'author': recipe.author.email,
+                'name': recipe.name,
+                'image': recipe.image.name,
+                'description': recipe.description,
+                'cooking_time': recipe.cooking_time,
+                'created_at': recipe.created_at.isoformat(),
+                'tags': [tag.slug for tag in recipe.tags.all()],
+                'ingredients': [
+                    [item.ingredient.name, item.amount]
+                    for item in recipe.recipeingredient_set.all()
+                ],
+            }
+
+    def favorites(self):
+        rows = (
+            Favorite.objects.filter(recipe__in=Recipe.objects.alive())
+            .order_by('pk').values_list('user__email', 'recipe_id')
+            .iterator(chunk_size=self.chunk_size)
+        )
+        return (
+            {'user': email, 'recipe': recipe_id} for email, recipe_id in rows
+        )
+
+    def add_image(self, archive, image):
+        try:
+            info = tarfile.TarInfo(image.name)
+            info.size = image.size
+            with image.open('rb') as file:
+                archive.addfile(info, file)
+        except OSError as e:
+            self.stderr.write(self.style.WARNING(
+                f'Пропущено изображение {image.name}: {e}'
+            ))
@@ -0,0 +1,127 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from recipes.models import (
+    Favorite, Recipe, RecipeEvent, RecipeIngredient, ShoppingCart,
+    SimilarRecipe, TrendingScore,
+)
+from rest_framework.authtoken.models import Token
+from users.models import Follow
+
+User = get_user_model()
+
+# Зависимые таблицы и поля, по которым они ссылаются на удаляемые строки.
+RECIPE_DEPENDENTS = [
+    (RecipeIngredient, 'recipe_id'),
+    (Favorite, 'recipe_id'),
+    (ShoppingCart, 'recipe_id'),
+    (Recipe.tags.through, 'recipe_id'),
+    (SimilarRecipe, 'recipe_id'),
+    (SimilarRecipe, 'similar_id'),
+    (RecipeEvent, 'recipe_id'),
+    (TrendingScore, 'recipe_id'),
+]
+USER_DEPENDENTS = [
+    (Follow, 'user_id'),
+    (Follow, 'author_id'),
+    (Favorite, 'user_id'),
+    (ShoppingCart, 'user_id'),
+    (Token, 'user_id'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Физически удаляет рецепты и пользователей, помеченных удалёнными, '
+        'вместе с зависимыми строками и изображениями. Удаление идёт '
+        'пачками без загрузки объектов в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Пауза между пачками, секунд',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.sleep = options['sleep']
+        self.recipes = 0
+        self.purge_recipes(Recipe._base_manager.filter(
+            Q(deleted_at__isnull=False) | Q(author__deleted_at__isnull=False)
+        ))
+        users = self.purge_users()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено рецептов: {self.recipes}, пользователей: {users}'
+        ))
+
+    def delete_in_batches(self, queryset):
+        """DELETE ... WHERE id IN (SELECT id ... LIMIT n), пока есть строки."""
+        model = queryset.model
+        total = 0
+        while True:
+            batch = model._base_manager.filter(
+                pk__in=queryset.values('pk')[:self.batch_size]
+            )
+            deleted = batch._raw_delete(batch.db)
+            total += deleted
+            if deleted < self.batch_size:
+                return total
+            if self.sleep:
+                time.sleep(self.sleep)
+
+    def purge_recipes(self, dead):
+        while True:
+            batch = list(dead.values_list('pk', 'image')[:self.batch_size])
+            if not batch:
+                return
+            ids = [pk for pk, _ in batch]
+            for model, field in RECIPE_DEPENDENTS:
+                self.delete_in_batches(
+                    model._base_manager.filter(**{f'{field}__in': ids})
+                )
+            queryset = Recipe._base_manager.filter(pk__in=ids)
+            self.recipes += queryset._raw_delete(queryset.db)
+            self.delete_images({image for _, image in batch if image})
+            if self.sleep:
+                time.sleep(self.sleep)
+
+    def delete_images(self, names):
+        in_use = set(
+            Recipe._base_manager.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        for name in names - in_use:
+            try:
+                default_storage.delete(name)
+            except OSError as e:
+                self.stderr.write(
+                    self.style.WARNING(f'Не удалось удалить {name}: {e}')
+                )
+
+    def purge_users(self):
+        total = 0
+        user_ids = list(
+            User._base_manager.filter(deleted_at__isnull=False)
+            .values_list('pk', flat=True)
+        )
+        for user_id in user_ids:
+            # Пользователь мог быть помечен удалённым уже после чистки
+            # рецептов выше: его рецепты тоже удаляются пачками, а не
+            # каскадом User.delete().
+            recipes = Recipe._base_manager.filter(author_id=user_id)
+            self.purge_recipes(recipes)
+            for model, field in USER_DEPENDENTS:
+                self.delete_in_batches(
+                    model._base_manager.filter(**{field: user_id})
+                )
+            if recipes.exists():
+                continue
+            # Массовые зависимости уже удалены, остальное удалит каскад.
+            User._base_manager.filter(pk=user_id).delete()
+            total += 1
+        return total
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from recipes.models import RecipeEvent, TrendingScore
+from recipes.trending import add_scores, event_score
+
+UPSERT_CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит новые события из журнала в рейтинг популярности рецептов. '
+        'Обработанные события удаляются, полного пересчёта нет. Несколько '
+        'запусков одновременно разбирают разные события.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            with transaction.atomic():
+                # Пачка блокируется до конца транзакции; параллельный
+                # запуск пропускает её и берёт следующие события.
+                events = list(
+                    RecipeEvent.objects.select_for_update(skip_locked=True)
+                    .order_by('pk')
+                    .values_list('pk', 'recipe_id', 'kind', 'created_at')
+                    [:options['batch_size']]
+                )
+                if not events:
+                    break
+                deltas = {}
+                for _, recipe_id, kind, created_at in events:
+                    score = event_score(kind, created_at)
+                    if recipe_id in deltas:
+                        score = add_scores(deltas[recipe_id], score)
+                    deltas[recipe_id] = score
+                self.add_to_scores(sorted(deltas.items()))
+                RecipeEvent.objects.filter(
+                    pk__in=[pk for pk, *_ in events]
+                ).delete()
+            total += len(events)
+        self.stdout.write(self.style.SUCCESS(f'Обработано событий: {total}'))
+
+    def add_to_scores(self, deltas):
+        """Прибавляет вклады к рейтингам одним upsert в SQL.
+
+        Сложение идёт в базе, поэтому не теряет обновления параллельных
+        запусков; строки идут по возрастанию id, чтобы запуски блокировали
+        их в одном порядке.
+        """
+        table = connection.ops.quote_name(TrendingScore._meta.db_table)
+        for start in range(0, len(deltas), UPSERT_CHUNK_SIZE):
+            chunk = deltas[start:start + UPSERT_CHUNK_SIZE]
+            values = ', '.join(['(%s, %s)'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (recipe_id, score) VALUES {values} '
+                    'ON CONFLICT (recipe_id) DO UPDATE SET score = '
+                    f'CASE WHEN {table}.score > EXCLUDED.score '
+                    f'THEN {table}.score ELSE EXCLUDED.score END '
+                    f'+ LN(1 + EXP(-ABS({table}.score - EXCLUDED.score)))',
+                    [value for row in chunk for value in row],
+                )
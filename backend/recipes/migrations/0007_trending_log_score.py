@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models.functions import Exp, Ln
+
+
+def to_log_scale(apps, schema_editor):
+    TrendingScore = apps.get_model('recipes', 'TrendingScore')
+    TrendingScore.objects.filter(score__gt=0).update(score=Ln('score'))
+
+
+def from_log_scale(apps, schema_editor):
+    TrendingScore = apps.get_model('recipes', 'TrendingScore')
+    TrendingScore.objects.update(score=Exp('score'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log_scale, from_log_scale),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -12,6 +13,11 @@ class Tag(models.Model):
 
 User = get_user_model()
 
+class RecipeQuerySet(models.QuerySet):
+    def alive(self):
+        """Рецепты, не помеченные удалёнными, от неудалённых авторов."""
+        return self.filter(deleted_at__isnull=True, author__deleted_at__isnull=True)
+
 class Recipe(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recipes')
     name = models.CharField(max_length=255)
@@ -20,11 +26,20 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('ingredients.Ingredient', through='RecipeIngredient')
     tags = models.ManyToManyField(Tag)
     cooking_time = models.PositiveIntegerField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def mark_deleted(self):
+        """Скрывает рецепт; сами строки удаляет команда purge_deleted."""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated_at'])
+
     class Meta:
         ordering = ['-created_at']
 
@@ -45,4 +60,34 @@ class ShoppingCart(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
     class Meta:
-        unique_together = ('user', 'recipe')
\ No newline at end of file
+        unique_together = ('user', 'recipe')
+
+class SimilarRecipe(models.Model):
+    """Заранее посчитанные похожие рецепты (см. build_similar_recipes)."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similar_recipes')
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+        unique_together = ('recipe', 'rank')
+
+class RecipeEvent(models.Model):
+    """Журнал добавлений в избранное и список покупок для update_trending."""
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    KIND_CHOICES = [(FAVORITE, 'Избранное'), (SHOPPING_CART, 'Список покупок')]
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class TrendingScore(models.Model):
+    """Логарифм рейтинга популярности рецепта, см. recipes.trending."""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='trending',
+    )
+    score = models.FloatField(db_index=True)
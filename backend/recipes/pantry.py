@@ -0,0 +1,255 @@
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .arrays import columns
+from .models import Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+# Сериализатор и админка сохраняют ингредиенты отдельными запросами уже
+# после рецепта, поэтому изменения перечитываются с запасом.
+CHANGES_OVERLAP = timedelta(minutes=1)
+REFRESH_CHUNK_SIZE = 1000
+
+EMPTY = np.zeros(0, dtype=np.int32)
+
+
+class PantryIndexNotReady(Exception):
+    """Первый снимок индекса не построен за PANTRY_READY_TIMEOUT секунд."""
+
+
+class PantrySnapshot:
+    """Неизменяемый снимок индекса в виде CSR-массивов.
+
+    Рецепты с ингредиентом i лежат в recipes[offsets[i]:offsets[i + 1]]
+    по возрастанию id, число ингредиентов рецепта r — в sizes[r].
+    """
+
+    def __init__(self, recipe_ids, ingredient_ids):
+        pairs = np.sort((ingredient_ids << 32) | recipe_ids)
+        pairs = pairs[np.diff(pairs, prepend=-1) != 0]
+        self.recipes = (pairs & 0xFFFFFFFF).astype(np.int32)
+        counts = np.bincount(pairs >> 32)
+        self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.sizes = np.bincount(self.recipes).astype(np.int32)
+
+    def postings(self, ingredient_id):
+        if not 0 <= ingredient_id < len(self.offsets) - 1:
+            return EMPTY
+        start, end = self.offsets[ingredient_id:ingredient_id + 2]
+        return self.recipes[start:end]
+
+    def merge(self, changes):
+        """Новый снимок, в котором рецепты из changes заменены их составом."""
+        ingredients = np.repeat(
+            np.arange(len(self.offsets) - 1, dtype=np.int64),
+            np.diff(self.offsets),
+        )
+        recipes = self.recipes.astype(np.int64)
+        changed = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        stale = np.zeros(
+            max(len(self.sizes), int(changed.max(initial=-1)) + 1), dtype=bool
+        )
+        stale[changed] = True
+        keep = ~stale[recipes]
+        added = [
+            (pk, ingredient_id)
+            for pk, (ingredient_ids, _) in changes.items()
+            for ingredient_id in ingredient_ids
+        ]
+        added = np.array(added, dtype=np.int64).reshape(-1, 2)
+        return PantrySnapshot(
+            np.concatenate([recipes[keep], added[:, 0]]),
+            np.concatenate([ingredients[keep], added[:, 1]]),
+        )
+
+
+class PantryIndex:
+    """Инвертированный индекс «ингредиент -> рецепты» для поиска по продуктам.
+
+    Основная часть индекса — снимок PantrySnapshot, который фоновый поток
+    строит и подменяет целиком, не задерживая запросы. Рецепты, изменённые
+    после построения снимка, лежат в небольшом слое изменений: их
+    ингредиенты поток раз в PANTRY_REFRESH_INTERVAL секунд перечитывает
+    по updated_at, так что правки из других процессов видны без полной
+    перестройки, а правки своего процесса сигналы вносят сразу.
+
+    Когда слой вырастает больше PANTRY_OVERLAY_LIMIT, он вливается в новый
+    снимок средствами numpy, без чтения базы. Полная перестройка из базы —
+    страховка от пропущенных изменений — идёт примерно раз в
+    PANTRY_REBUILD_INTERVAL секунд со случайным сдвигом, чтобы воркеры
+    не сканировали RecipeIngredient одновременно.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._changes = {}
+        self._rebuild_at = None
+        self._watermark = None
+
+    def start(self):
+        """Запускает фоновое обновление индекса, если оно ещё не запущено."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='pantry-index', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if (
+                    self._snapshot is None
+                    or time.monotonic() > self._rebuild_at
+                ):
+                    self.rebuild()
+                else:
+                    self.poll_changes()
+                    if len(self._changes) > settings.PANTRY_OVERLAY_LIMIT:
+                        self.compact()
+            except Exception:
+                logger.exception('Не удалось обновить индекс продуктов')
+            finally:
+                connection.close()
+            time.sleep(settings.PANTRY_REFRESH_INTERVAL)
+
+    def rebuild(self):
+        started = time.monotonic()
+        watermark = timezone.now()
+        recipe_ids, ingredient_ids = columns(
+            RecipeIngredient.objects
+            .filter(recipe__deleted_at__isnull=True)
+            .values_list('recipe_id', 'ingredient_id'),
+            2,
+        )
+        snapshot = PantrySnapshot(recipe_ids, ingredient_ids)
+        with self._lock:
+            self._snapshot = snapshot
+            # Изменения, внесённые во время построения, снимок мог не увидеть.
+            self._changes = {
+                pk: change for pk, change in self._changes.items()
+                if change[1] > started
+            }
+            self._rebuild_at = started + random.uniform(0.5, 1.5) * (
+                settings.PANTRY_REBUILD_INTERVAL
+            )
+            self._watermark = watermark
+        self._ready.set()
+
+    def compact(self):
+        """Вливает слой изменений в новый снимок без чтения базы."""
+        with self._lock:
+            snapshot, changes = self._snapshot, self._changes
+        merged = snapshot.merge(changes)
+        with self._lock:
+            self._snapshot = merged
+            # Записи, обновлённые во время слияния, остаются в слое.
+            self._changes = {
+                pk: change for pk, change in self._changes.items()
+                if changes.get(pk) is not change
+            }
+
+    def poll_changes(self):
+        """Подхватывает рецепты, изменённые с прошлого опроса."""
+        watermark = timezone.now()
+        recipe_ids = list(
+            Recipe.objects
+            .filter(updated_at__gte=self._watermark - CHANGES_OVERLAP)
+            .values_list('pk', flat=True)
+        )
+        # Большие правки (импорт) читаются частями и затем вливаются в снимок
+        # через compact(), без полного сканирования RecipeIngredient.
+        for start in range(0, len(recipe_ids), REFRESH_CHUNK_SIZE):
+            self.refresh_recipes(recipe_ids[start:start + REFRESH_CHUNK_SIZE])
+        self._watermark = watermark
+
+    def _apply(self, ingredients):
+        stamp = time.monotonic()
+        with self._lock:
+            changes = dict(self._changes)
+            changes.update(
+                (pk, (frozenset(ingredient_ids), stamp))
+                for pk, ingredient_ids in ingredients.items()
+            )
+            self._changes = changes
+
+    def discard_recipe(self, recipe_id):
+        if self._snapshot is not None:
+            self._apply({recipe_id: ()})
+
+    def refresh_recipe(self, recipe_id):
+        self.refresh_recipes([recipe_id])
+
+    def refresh_recipes(self, recipe_ids):
+        """Перечитывает ингредиенты рецептов из базы в слой изменений."""
+        if self._snapshot is None or not recipe_ids:
+            return
+        ingredients = {pk: set() for pk in recipe_ids}
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids, recipe__deleted_at__isnull=True
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].add(ingredient_id)
+        self._apply(ingredients)
+
+    def search(self, ingredient_ids, limit):
+        """Возвращает id рецептов, отсортированные по покрытию продуктами.
+
+        Сначала идут рецепты, которые можно приготовить полностью, затем —
+        по возрастанию числа недостающих ингредиентов; при равенстве —
+        по убыванию числа совпавших ингредиентов и более новые рецепты.
+        """
+        self.start()
+        if not self._ready.wait(settings.PANTRY_READY_TIMEOUT):
+            raise PantryIndexNotReady
+        with self._lock:
+            snapshot, changes = self._snapshot, self._changes
+        wanted = set(ingredient_ids)
+        matched = np.bincount(np.concatenate(
+            [EMPTY] + [snapshot.postings(pk) for pk in wanted]
+        ))
+        sizes = snapshot.sizes
+        if changes:
+            # Рецепты из слоя изменений считаем по их актуальному составу.
+            changed = np.fromiter(changes, dtype=np.int64, count=len(changes))
+            counts = np.fromiter(
+                (len(ids & wanted) for ids, _ in changes.values()),
+                dtype=np.int64, count=len(changes),
+            )
+            changed_sizes = np.fromiter(
+                (len(ids) for ids, _ in changes.values()),
+                dtype=np.int32, count=len(changes),
+            )
+            length = max(len(matched), int(changed.max()) + 1)
+            matched = np.pad(matched, (0, length - len(matched)))
+            matched[changed] = counts
+            sizes = np.pad(sizes, (0, max(length - len(sizes), 0)))
+            sizes[changed] = changed_sizes
+        candidates = np.flatnonzero(matched)
+        matched = matched[candidates]
+        missing = sizes[candidates] - matched
+        # Составной ключ: недостающие, затем совпавшие и id по убыванию.
+        key = (
+            (missing << 48) | ((0xFFFF - matched) << 32)
+            | (0xFFFFFFFF - candidates)
+        )
+        if len(key) > limit:
+            top = np.argpartition(key, limit)[:limit]
+            candidates, key = candidates[top], key[top]
+        return candidates[np.argsort(key)].tolist()
+
+
+pantry_index = PantryIndex()
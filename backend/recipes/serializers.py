@@ -46,7 +46,10 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'author', 'tags', 'ingredients', 'description', 'cooking_time', 'image']
+        fields = [
+            'id', 'name', 'author', 'tags', 'ingredients', 'description', 'cooking_time', 'image',
+            'is_favorited', 'is_in_shopping_cart',
+        ]
 
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное."""
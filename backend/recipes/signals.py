@@ -0,0 +1,52 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Favorite, Recipe, RecipeEvent, RecipeIngredient, ShoppingCart,
+)
+from .pantry import pantry_index
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def refresh_pantry_on_ingredient_save(sender, instance, **kwargs):
+    pantry_index.refresh_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_pantry_on_ingredients_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        pantry_index.refresh_recipe(instance.pk)
+    else:
+        for recipe_id in pk_set or ():
+            pantry_index.refresh_recipe(recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_pantry_on_recipe_delete(sender, instance, **kwargs):
+    pantry_index.discard_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def discard_pantry_on_recipe_mark_deleted(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        pantry_index.discard_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+def log_favorite_event(sender, instance, created, **kwargs):
+    if created:
+        RecipeEvent.objects.create(
+            recipe_id=instance.recipe_id, kind=RecipeEvent.FAVORITE
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def log_shopping_cart_event(sender, instance, created, **kwargs):
+    if created:
+        RecipeEvent.objects.create(
+            recipe_id=instance.recipe_id, kind=RecipeEvent.SHOPPING_CART
+        )
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy import sparse
+
+TOP_K = 10
+TAG_WEIGHT = 0.5
+MAX_DF = 0.01
+# В маленьком каталоге доля max_df — единицы рецептов; там кандидатов
+# и так немного, и частые ингредиенты не обнуляются.
+MAX_DF_FLOOR = 100
+MIN_SCORE = 0.2
+
+
+def feature_matrix(rows, cols, weights, shape, max_df, n_ingredients):
+    """Собирает нормированную матрицу «рецепт × признак» с весами TF-IDF.
+
+    Первые n_ingredients столбцов — ингредиенты, за ними идут теги.
+    Ингредиенты, встречающиеся более чем в доле max_df рецептов (соль,
+    вода), почти не отличают рецепты друг от друга и только раздувают
+    число кандидатов, поэтому их вес обнуляется. Тегов мало, и каждый
+    из них встречается часто, поэтому на них ограничение не действует.
+    """
+    matrix = sparse.csr_matrix(
+        (weights, (rows, cols)), shape=shape, dtype=np.float32
+    )
+    matrix.sum_duplicates()
+    n_recipes = shape[0]
+    df = np.bincount(matrix.indices, minlength=shape[1])
+    idf = (np.log((1 + n_recipes) / (1 + df)) + 1).astype(np.float32)
+    limit = max(max_df * n_recipes, MAX_DF_FLOOR)
+    idf[:n_ingredients][df[:n_ingredients] > limit] = 0
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(
+        np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+    )
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms).astype(np.float32) @ matrix
+    matrix.eliminate_zeros()
+    return matrix.tocsr()
+
+
+def related_rows(matrix, row_indices, min_score, batch_size=256):
+    """Возвращает row_indices и все строки, похожие на них не меньше min_score.
+
+    Сходство симметрично, поэтому это ровно те строки, в чьих соседях
+    может появиться или смениться одна из row_indices.
+    """
+    transposed = matrix.T.tocsr()
+    row_indices = np.asarray(row_indices, dtype=np.int64)
+    related = [row_indices]
+    for start in range(0, len(row_indices), batch_size):
+        scores = matrix[row_indices[start:start + batch_size]] @ transposed
+        scores = scores.tocsr()
+        related.append(scores.indices[scores.data >= min_score])
+    return np.unique(np.concatenate(related))
+
+
+def top_k_neighbours(matrix, row_indices, k, min_score, batch_size=256):
+    """Для каждой строки из row_indices находит k ближайших по косинусу.
+
+    Для каждой пачки строк возвращает её саму и массивы (строка, сосед,
+    сходство, место). Произведение считается разреженным, пары со сходством
+    ниже min_score отбрасываются до сортировки.
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(row_indices), batch_size):
+        batch = np.asarray(row_indices[start:start + batch_size])
+        scores = (matrix[batch] @ transposed).tocsr()
+        owner = np.repeat(np.arange(len(batch)), np.diff(scores.indptr))
+        keep = (scores.data >= min_score) & (scores.indices != batch[owner])
+        owner = owner[keep]
+        neighbours, data = scores.indices[keep], scores.data[keep]
+        # Сходство лежит в (0, 1], поэтому один ключ упорядочивает
+        # по строке и по убыванию сходства.
+        order = np.argsort(
+            owner - data.astype(np.float64) / 2, kind='stable'
+        )
+        owner, neighbours, data = owner[order], neighbours[order], data[order]
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        selected = rank < k
+        yield (
+            batch, batch[owner[selected]], neighbours[selected],
+            data[selected], rank[selected],
+        )
@@ -1,3 +1,92 @@
-from django.test import TestCase
+import random
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .pantry import PantryIndex, PantryIndexNotReady, PantrySnapshot
+
+
+def make_index(recipes):
+    """Индекс по словарю {рецепт: ингредиенты} без фонового потока."""
+    pairs = np.array(
+        [(pk, i) for pk, ingredients in recipes.items() for i in ingredients],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    index = PantryIndex()
+    index._thread = object()
+    index._snapshot = PantrySnapshot(pairs[:, 0], pairs[:, 1])
+    index._ready.set()
+    return index
+
+
+def brute_force(recipes, ingredient_ids, limit):
+    wanted = set(ingredient_ids)
+    ranked = [
+        (len(ingredients - wanted), -len(ingredients & wanted), -pk)
+        for pk, ingredients in recipes.items()
+        if ingredients & wanted
+    ]
+    return [-key[2] for key in sorted(ranked)[:limit]]
+
+
+class PantryIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.recipes = {
+            pk: set(self.rng.sample(range(1, 40), self.rng.randint(1, 8)))
+            for pk in range(1, 300)
+        }
+
+    def random_query(self):
+        return self.rng.sample(range(1, 45), self.rng.randint(1, 10))
+
+    def assert_matches_brute_force(self, index, recipes):
+        for _ in range(200):
+            query = self.random_query()
+            limit = self.rng.choice([5, 50, 1000])
+            self.assertEqual(
+                index.search(query, limit),
+                brute_force(recipes, query, limit),
+                query,
+            )
+
+    def test_ranking_matches_brute_force(self):
+        self.assert_matches_brute_force(make_index(self.recipes), self.recipes)
+
+    def test_changes_override_snapshot(self):
+        index = make_index(self.recipes)
+        recipes = dict(self.recipes)
+        for pk in self.rng.sample(sorted(recipes), 30):
+            recipes[pk] = set(self.rng.sample(range(1, 40), 3))
+        for pk in self.rng.sample(sorted(recipes), 10):
+            recipes[pk] = set()
+        recipes[500] = {1, 2}
+        index._apply({
+            pk: ingredients for pk, ingredients in recipes.items()
+            if ingredients != self.recipes.get(pk)
+        })
+        recipes = {pk: ids for pk, ids in recipes.items() if ids}
+        self.assert_matches_brute_force(index, recipes)
+
+        index.compact()
+        self.assertEqual(index._changes, {})
+        self.assert_matches_brute_force(index, recipes)
+
+    @override_settings(PANTRY_READY_TIMEOUT=0)
+    def test_search_fails_fast_before_first_snapshot(self):
+        index = PantryIndex()
+        index._thread = object()
+        with self.assertRaises(PantryIndexNotReady):
+            index.search([1], 10)
+
+
+class CookableViewTests(TestCase):
+    def test_not_ready_index_returns_503(self):
+        with mock.patch(
+            'recipes.views.pantry_index.search',
+            side_effect=PantryIndexNotReady,
+        ):
+            response = APIClient().get('/api/recipes/cookable/?ingredients=1')
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,25 @@
+import math
+
+from django.conf import settings
+
+# Рейтинг рецепта в момент t — сумма весов событий с экспоненциальным
+# затуханием:
+#     score(t) = sum(w_i * exp(-(t - t_i) / tau))
+#              = exp(-(t - t0) / tau) * sum(w_i * exp((t_i - t0) / tau)).
+# Множитель перед суммой одинаков для всех рецептов, поэтому порядок по
+# сумме совпадает с порядком по затухающему рейтингу. Сама сумма растёт
+# как exp(t / tau) и через несколько лет переполнила бы float, поэтому
+# хранится её логарифм: он растёт линейно, на ~84 в год при периоде
+# полураспада в 3 дня, а новые события прибавляются через log-sum-exp.
+
+
+def event_score(kind, created_at):
+    """Вклад одного события в рейтинг, в логарифмической шкале."""
+    tau = settings.TRENDING_HALF_LIFE.total_seconds() / math.log(2)
+    age = (created_at - settings.TRENDING_EPOCH).total_seconds()
+    return math.log(settings.TRENDING_WEIGHTS[kind]) + age / tau
+
+
+def add_scores(a, b):
+    """log(exp(a) + exp(b)) без переполнения."""
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
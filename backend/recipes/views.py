@@ -2,8 +2,12 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
-from .models import Recipe, Favorite, ShoppingCart, Tag, RecipeIngredient
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from .models import Recipe, Favorite, ShoppingCart, Tag, RecipeIngredient, SimilarRecipe
+from .pantry import PantryIndexNotReady, pantry_index
 from .serializers import RecipeSerializer, TagSerializer
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -11,12 +15,82 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.alive()
     serializer_class = RecipeSerializer
 
+    def get_tags(self):
+        return sorted(set(self.request.query_params.getlist('tags')))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tags = self.get_tags()
+        if tags:
+            queryset = queryset.filter(
+                pk__in=Recipe.tags.through.objects.filter(tag__slug__in=tags).values('recipe_id')
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('ordering') == 'trending':
+            return self.list_by_ids(self.trending_ids())
+        return super().list(request, *args, **kwargs)
+
+    def trending_ids(self):
+        """Первые TRENDING_LIMIT популярных рецептов, кешируются по набору тегов."""
+        key = 'trending:' + ','.join(self.get_tags())
+        ids = cache.get(key)
+        if ids is None:
+            queryset = self.get_queryset().filter(trending__isnull=False).order_by('-trending__score')
+            ids = list(queryset.values_list('pk', flat=True)[:settings.TRENDING_LIMIT])
+            cache.set(key, ids, timeout=settings.TRENDING_CACHE_TTL)
+        return ids
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.mark_deleted()
+
+    def list_by_ids(self, recipe_ids):
+        """Постраничная выдача рецептов в порядке переданного списка id."""
+        page = self.paginate_queryset(recipe_ids)
+        ids = page if page is not None else recipe_ids
+        recipes = self.get_queryset().in_bulk(ids)
+        ordered = [recipes[pk] for pk in ids if pk in recipes]
+        serializer = self.get_serializer(ordered, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов."""
+        raw_ids = []
+        for value in request.query_params.getlist('ingredients'):
+            raw_ids.extend(part for part in value.split(',') if part)
+        try:
+            ingredient_ids = [int(pk) for pk in raw_ids]
+        except ValueError:
+            return Response({'errors': 'Некорректный список ингредиентов'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ingredient_ids:
+            return Response({'errors': 'Укажите хотя бы один ингредиент'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.PANTRY_SEARCH_LIMIT
+        try:
+            recipe_ids = pantry_index.search(ingredient_ids, limit)
+        except PantryIndexNotReady:
+            return Response(
+                {'errors': 'Поиск по продуктам ещё не готов, повторите позже'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return self.list_by_ids(recipe_ids)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие рецепты, заранее посчитанные build_similar_recipes."""
+        recipe = self.get_object()
+        similar_ids = SimilarRecipe.objects.filter(recipe=recipe).values_list('similar_id', flat=True)
+        return self.list_by_ids(list(similar_ids))
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
         recipe = self.get_object()
@@ -55,13 +129,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        shopping_cart = ShoppingCart.objects.filter(user=request.user)
-        ingredients = RecipeIngredient.objects.filter(recipe__in=shopping_cart.values('recipe'))
-        shopping_list = {}
-        for item in ingredients:
-            key = f"{item.ingredient.name} ({item.ingredient.measurement_unit})"
-            shopping_list[key] = shopping_list.get(key, 0) + item.amount
-        content = "\n".join([f"{name}: {amount}" for name, amount in shopping_list.items()])
-        response = HttpResponse(content, content_type='text/plain')
+        shopping_cart = ShoppingCart.objects.filter(user=request.user, recipe__in=Recipe.objects.alive())
+        ingredients = (
+            RecipeIngredient.objects.filter(recipe__in=shopping_cart.values('recipe'))
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(total=Sum('amount'))
+            .order_by('ingredient__name')
+        )
+        lines = (
+            f"{item['ingredient__name']} ({item['ingredient__measurement_unit']}): {item['total']}\n"
+            for item in ingredients.iterator()
+        )
+        response = StreamingHttpResponse(lines, content_type='text/plain')
         response['Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
         return response
\ No newline at end of file
@@ -6,4 +6,16 @@ User = get_user_model()
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ['username', 'email']
-    search_fields = ['username', 'email']
\ No newline at end of file
+    search_fields = ['username', 'email']
+    list_filter = ['is_active']
+    actions = ['mark_deleted']
+
+    def mark_deleted(self, request, queryset):
+        for user in queryset:
+            user.mark_deleted()
+    mark_deleted.short_description = 'Деактивировать и удалить в фоне'
+
+    def has_delete_permission(self, request, obj=None):
+        # Синхронное удаление тянет каскад по всем рецептам пользователя;
+        # вместо него — mark_deleted и команда purge_deleted.
+        return False
\ No newline at end of file
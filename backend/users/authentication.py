@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+# Поля пользователя, которые кладутся в кеш; остальные (в том числе хеш
+# пароля) подгружаются из базы только при обращении к ним.
+CACHED_USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+
+class TokenCache:
+    """Кеш токенов: локальный LRU процесса поверх общего кеша auth_tokens.
+
+    Локальные записи живут AUTH_TOKEN_LOCAL_TTL секунд, записи в общем
+    кеше — AUTH_TOKEN_CACHE_TTL секунд. Инвалидация меняет версию токена
+    в общем кеше: записи со старой версией, в том числе записанные
+    запросом, который прочитал базу до выхода из системы, больше не
+    принимаются. LRU текущего процесса очищается сразу, остальные
+    процессы увидят инвалидацию не позже истечения своего локального TTL.
+    """
+
+    key_prefix = 'auth_token:'
+    version_prefix = 'auth_token_version:'
+
+    def __init__(self, alias, max_size, local_ttl, shared_ttl):
+        self.alias = alias
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        # Число инвалидаций в процессе: значение, прочитанное до одной
+        # из них, не попадает в локальный LRU.
+        self._generation = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, local_size=len(self._local))
+
+    def _hash(self, key):
+        # В общем кеше храним хеш, а не сам токен.
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _cache_key(self, key):
+        return self.key_prefix + self._hash(key)
+
+    def _version_key(self, key):
+        return self.version_prefix + self._hash(key)
+
+    def _store_local(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._local[key] = (value, time.monotonic() + self.local_ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def get_or_set(self, key, default):
+        """Возвращает значение для токена, на промахе вызывает default()."""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._local.move_to_end(key)
+                    self._stats['local_hits'] += 1
+                    return entry[0]
+                del self._local[key]
+            generation = self._generation
+        cache_key, version_key = self._cache_key(key), self._version_key(key)
+        values = self.shared.get_many([cache_key, version_key])
+        version = values.get(version_key)
+        entry = values.get(cache_key)
+        if entry is not None and entry['version'] == version:
+            with self._lock:
+                self._stats['shared_hits'] += 1
+            self._store_local(key, entry['value'], generation)
+            return entry['value']
+        with self._lock:
+            self._stats['misses'] += 1
+        value = default()
+        # Запись несёт версию, прочитанную до обращения к базе: если токен
+        # успели инвалидировать, get_or_set её не примет.
+        self.shared.set(
+            cache_key, {'version': version, 'value': value},
+            timeout=self.shared_ttl,
+        )
+        self._store_local(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        # Версия живёт дольше записей, записанных до её смены.
+        self.shared.set(
+            self._version_key(key), uuid.uuid4().hex,
+            timeout=2 * self.shared_ttl,
+        )
+        self.shared.delete(self._cache_key(key))
+        with self._lock:
+            self._generation += 1
+            self._local.pop(key, None)
+
+
+token_cache = TokenCache(
+    alias='auth_tokens',
+    max_size=settings.AUTH_TOKEN_LOCAL_SIZE,
+    local_ttl=settings.AUTH_TOKEN_LOCAL_TTL,
+    shared_ttl=settings.AUTH_TOKEN_CACHE_TTL,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе на каждый вызов API."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get_or_set(key, lambda: self.load(key))
+        # Каждый запрос получает свои объекты, не разделяемые с кешем.
+        # from_db ждёт значения в порядке полей модели.
+        fields = cached['user']
+        names = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in fields
+        ]
+        user = User.from_db(
+            router.db_for_read(User), names, [fields[name] for name in names]
+        )
+        token = Token.from_db(
+            user._state.db, ['key', 'user_id', 'created'],
+            [key, user.pk, cached['created']],
+        )
+        token.user = user
+        return user, token
+
+    def load(self, key):
+        user, token = super().authenticate_credentials(key)
+        return {
+            'user': {
+                field: getattr(user, field) for field in CACHED_USER_FIELDS
+            },
+            'created': token.created,
+        }
@@ -1,3 +1,112 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.test import TestCase
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import token_cache
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    password = 'Sup3r-secret-pass'
+
+    def setUp(self):
+        caches['auth_tokens'].clear()
+        token_cache._local.clear()
+        self.user = User.objects.create_user(
+            email='cook@example.com', username='cook', password=self.password,
+            first_name='Иван', last_name='Поваров',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_repeated_requests_hit_cache(self):
+        with mock.patch.object(
+            TokenAuthentication, 'authenticate_credentials', autospec=True,
+            side_effect=TokenAuthentication.authenticate_credentials,
+        ) as lookup:
+            self.assertEqual(self.get_me().status_code, 200)
+            response = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.assertEqual(lookup.call_count, 1)
+
+    def test_password_hash_is_not_cached(self):
+        self.get_me()
+        cached = caches['auth_tokens'].get(
+            token_cache._cache_key(self.token.key)
+        )
+        self.assertNotIn('password', cached['value']['user'])
+        self.assertNotIn(self.user.password, repr(cached))
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_set_password_invalidates_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': self.password,
+            'new_password': 'An0ther-secret-pass',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(caches['auth_tokens'].get(
+            token_cache._cache_key(self.token.key)
+        ))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('An0ther-secret-pass'))
+
+    def test_deactivation_invalidates_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_mark_deleted_invalidates_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.user.mark_deleted()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_logout_during_lookup_is_not_cached(self):
+        def lookup_then_logout(auth, key):
+            result = authenticate_credentials(auth, key)
+            # Выход из системы после чтения токена, но до записи в кеш.
+            Token.objects.filter(key=key).delete()
+            return result
+
+        authenticate_credentials = TokenAuthentication.authenticate_credentials
+        with mock.patch.object(
+            TokenAuthentication, 'authenticate_credentials', autospec=True,
+            side_effect=lookup_then_logout,
+        ):
+            self.assertEqual(self.get_me().status_code, 200)
+        self.assertEqual(self.get_me().status_code, 401)
+        # Запись с устаревшей версией не принимают и другие процессы.
+        token_cache._local.clear()
+        self.assertEqual(self.get_me().status_code, 401)
 
-# Create your tests here.
+    def test_stats_are_available_to_staff(self):
+        self.get_me()
+        self.get_me()
+        self.assertEqual(
+            self.client.get('/api/users/token_cache_stats/').status_code, 403
+        )
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', is_staff=True,
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/users/token_cache_stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.data['local_hits'], 1)
+        self.assertIn('pid', response.data)
@@ -1,10 +1,24 @@
+import os
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 from djoser.views import UserViewSet as DjoserUserViewSet
 from django.contrib.auth import get_user_model
+from .authentication import token_cache
 from .serializers import CustomUserSerializer
 
 User = get_user_model()
 
 class UserViewSet(DjoserUserViewSet):
-    queryset = User.objects.all()
-    serializer_class = CustomUserSerializer
\ No newline at end of file
+    queryset = User.objects.filter(deleted_at__isnull=True)
+    serializer_class = CustomUserSerializer
+
+    def perform_destroy(self, instance):
+        instance.mark_deleted()
+
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def token_cache_stats(self, request):
+        """Счётчики кеша токенов процесса, обработавшего запрос."""
+        return Response({'pid': os.getpid(), **token_cache.stats})
\ No newline at end of file